@@ -9,12 +9,14 @@ and deploys modules to create and save logix circuits.
 
 
 from src.circuit import Circuit
+import src.layout as layout
+import src.netlist as netlist
 import src.resource as resource
 
 import sys
 import json
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, messagebox
 from enum import Enum
 from ttkthemes import ThemedStyle
 from PIL import ImageTk, Image
@@ -85,9 +87,11 @@ class Editor:
     input_data = object_data["inputs"]
     output_data = object_data["outputs"]
 
-    objects = []
-    nodes = []
-    edges = []
+    # Dicts keep insertion order, so they double as newest-to-oldest lists when reversed
+    objects = {} # key = object, value = {node type: node}
+    nodes = {} # key = node, value = object the node is attached to
+    edges = {} # key = edge, value = (start node, end node)
+    node_edges = {} # key = node, value = set of edges attached to the node
     # *Avoids garbage collection and helps to reference tag names*
     loaded_assets = {} # key = title, value = asset
 
@@ -127,6 +131,8 @@ class Editor:
         self.input_buttons = []
         self.output_frame = ttk.LabelFrame(self.sidebar, text = "Outputs", padding = 4)
         self.output_buttons = []
+        self.netlist_frame = ttk.LabelFrame(self.sidebar, text = "Netlist", padding = 4)
+        self.import_button = ttk.Button(self.netlist_frame, text = "import", width = 10, command = self.import_netlist)
 
         self.frame = ttk.LabelFrame(self.window, text="Diagram", padding = 2)
         self.diagram = tk.Canvas(self.frame, bg = self.CANVAS_COLOR)
@@ -180,6 +186,7 @@ class Editor:
         self.diagram.bind("<ButtonPress-1>", self.down_handler)
         self.diagram.bind("<ButtonRelease-1>", self.up_handler)
         self.diagram.bind("<B1-Motion>", self.move_handler)
+        self.diagram.bind("<ButtonPress-3>", self.delete_handler)
 
         # Configure the Editor's grid scaling
         self.window.rowconfigure(0, weight=1)
@@ -188,6 +195,7 @@ class Editor:
         self.sidebar.rowconfigure(0,weight = 0)
         self.sidebar.rowconfigure(1, weight = 0)
         self.sidebar.rowconfigure(2, weight = 1)
+        self.sidebar.rowconfigure(3, weight = 0)
         self.sidebar.columnconfigure(0, weight = 1)
 
         self.frame.rowconfigure(0, weight=1)
@@ -200,12 +208,14 @@ class Editor:
             self.input_buttons[i].grid(row = i, column = 0, sticky = "EW")
         for i in range(len(self.output_buttons)):
             self.output_buttons[i].grid(row = i, column = 0, sticky = "EW")
+        self.import_button.grid(row = 0, column = 0, sticky = "EW")
         # Add all other widgets to Editor grid
         self.diagram.grid(row = 0, column = 0, sticky = "NSEW")
         self.sidebar.grid(row = 0, column = 0, sticky = "NS")
         self.gate_frame.grid(row = 0, column = 0, sticky = "NSEW")
         self.input_frame.grid(row = 1, column = 0, sticky = "NSEW")
         self.output_frame.grid(row = 2, column = 0, sticky = "NSEW")
+        self.netlist_frame.grid(row = 3, column = 0, sticky = "NSEW")
         self.frame.grid(row = 0, column = 1, sticky = "NSEW")
 
 
@@ -243,25 +253,33 @@ class Editor:
         self.diagram.addtag_withtag(type, node)
         self.diagram.addtag_withtag("object" + str(object_id), node)
         self.diagram.tag_raise(node)
-        self.nodes.append(node)
+        self.nodes[node] = object_id
+        self.objects[object_id][type] = node
+        self.node_edges[node] = set()
 
 
     def draw_gate(self, event):
+        """Handle gate button click and create the respective gate at the center of the diagram."""
+
+        title = event.widget['text']
+        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
+        gate = self.create_gate(title, center_x, center_y)
+
+        self.circuit.add_node(gate, title, self.gate_data["gate_types"][title])
+
+
+    def create_gate(self, title, center_x, center_y):
         """
-        Handle gate button click and create respective gate and nodes on the diagram.
-        Appropriately tag gate.
+        Create a gate and its nodes on the diagram centered at (center_x, center_y).
+        Appropriately tag gate and return its id. Does not add it to the circuit.
         """
 
-        title = event.widget['text']
         num_inputs = self.gate_data["gate_types"][title]
         node_fill_color = self.gate_data["node_fill"]
 
-        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
         gate = self.diagram.create_image(center_x, center_y, image = self.loaded_assets[title])
         self.diagram.tag_raise(gate)
-        self.objects.append(gate)
-
-        self.circuit.add_node(gate, title, num_inputs)
+        self.objects[gate] = {}
 
         # Create input nodes
         if num_inputs == 1:
@@ -281,23 +299,31 @@ class Editor:
         adjusted_coords = self.adjust_coords(center_x, center_y, coords)
         self.draw_node(adjusted_coords, node_fill_color, "output", gate)
 
+        return gate
+
 
     def draw_input(self, event):
+        """Handle input button click and create the correct object at the center of the diagram."""
+
+        title = event.widget['text']
+        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
+        input = self.create_input(title, center_x, center_y)
+
+        self.circuit.add_node(input, 0, 0,
+                              output = True if (title == "constant on") else False)
+
+
+    def create_input(self, title, center_x, center_y):
         """
-        Handle input button click and create the correct object on the diagram.
-        Appropriately tag input object and add output node
+        Create an input object on the diagram centered at (center_x, center_y).
+        Appropriately tag input object, add output node and return its id. Does not add it to the circuit.
         """
 
-        title = event.widget['text']
         node_fill_color = self.object_data["gates"]["node_fill"]
 
-        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
         input = self.diagram.create_image(center_x, center_y, image = self.loaded_assets[title])
         self.diagram.tag_raise(input)
-        self.objects.append(input)
-
-        self.circuit.add_node(input, 0, 0,
-                              output = True if (title == "constant on") else False)
+        self.objects[input] = {}
 
         output_coords = self.input_data[title]["output_position"]
         adjusted_output_coords = self.adjust_coords(center_x, center_y, output_coords)
@@ -309,58 +335,174 @@ class Editor:
         elif title == "switch":
             self.diagram.tag_bind(input, "<ButtonRelease-1>", lambda event: self.switch_click(event, input))
 
+        return input
+
     
     def draw_output(self, event):
+        """Handle the click of an output button and create the corresponding object at the center of the diagram"""
+
+        title = event.widget['text']
+        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
+        output = self.create_output(title, center_x, center_y)
+
+        self.circuit.add_node(output, 0, 1)
+
+
+    def create_output(self, title, center_x, center_y):
         """
-        Handle the click of an output button and create the corresponding object on the diagram
-        Appropriately tag output object and add input node
+        Create an output object on the diagram centered at (center_x, center_y).
+        Appropriately tag output object, add input node and return its id. Does not add it to the circuit.
         """
 
-        title = event.widget['text']
         node_fill_color = self.object_data["gates"]["node_fill"]
 
-        center_x, center_y = self.diagram.winfo_width()/2, self.diagram.winfo_height()/2
         output = self.diagram.create_image(center_x, center_y, image = self.loaded_assets[title])
         self.diagram.addtag_withtag("output_obj", output)
         self.diagram.tag_raise(output)
-        self.objects.append(output)
-
-        self.circuit.add_node(output, 0, 1)
+        self.objects[output] = {}
 
         input_coords = self.output_data[title]["input_position"]
         adjusted_input_coords = self.adjust_coords(center_x, center_y, input_coords)
         self.draw_node(adjusted_input_coords, node_fill_color, "input0", output)
 
+        return output
+
+
+    def connect_nodes(self, edge, start_node, end_node):
+        """
+        Attach an edge line from an output node to an input node on the diagram.
+        Move the line between the node centers and tag it. Does not add it to the circuit.
+        """
+
+        self.edges[edge] = (start_node, end_node)
+        self.node_edges[start_node].add(edge)
+        self.node_edges[end_node].add(edge)
+
+        # Adjust edge coords to final position
+        x0, y0 = self.find_center_coords(self.diagram.coords(start_node))
+        x1, y1 = self.find_center_coords(self.diagram.coords(end_node))
+        self.diagram.coords(edge, x0, y0, x1, y1)
+
+        # Create tags that describe the two nodes the edge conects
+        self.diagram.addtag_withtag("start" + str(start_node), edge)
+        self.diagram.addtag_withtag("end" + str(end_node), edge)
+        self.diagram.addtag_withtag("start_gate" + str(self.nodes[start_node]), edge)
+        self.diagram.addtag_withtag("end_gate" + str(self.nodes[end_node]), edge)
+        self.diagram.addtag_withtag("has_input", end_node)
+
+
+    def draw_circuit(self, circuit, inputs = None):
+        """
+        Lay out circuit (such as an imported netlist) and add it to the diagram and the editor circuit.
+        Every object and edge is created before the circuit settles and the edges are colored once.
+
+        PARAMETERS
+        ----------
+        circuit : Circuit
+                  circuit to draw, its node ids are replaced by diagram object ids
+        inputs : list
+                 ids of the nodes drawn as switches, other nodes without inputs are drawn as constants.
+                 Defaults to every node without inputs.
+        """
+
+        graph = circuit.graph
+        if inputs is None:
+            inputs = [id for id in graph if not graph.nodes[id]["input"]]
+        inputs = set(inputs)
+
+        # Start at the top left of the visible diagram
+        margin = self.gate_data["dimensions"][0]
+        origin = (self.diagram.canvasx(0) + margin, self.diagram.canvasy(0) + margin)
+        positions = layout.layered(graph, origin = origin)
+
+        objects = {} # key = circuit node, value = diagram object
+        new_nodes = []
+        for id, data in graph.nodes(data = True):
+            x, y = positions[id]
+            if data["logic"]:
+                object = self.create_gate(data["logic"], x, y)
+            elif data["input"]:
+                object = self.create_output("lightbulb", x, y)
+            elif id in inputs:
+                object = self.create_input("switch", x, y)
+                if data["output"]:
+                    self.diagram.itemconfig(object, image = self.loaded_assets["switch_changed"])
+                    self.diagram.addtag_withtag("on", object)
+            else:
+                object = self.create_input("constant on" if data["output"] else "constant off", x, y)
+
+            objects[id] = object
+            new_nodes.append((object, data["logic"], len(data["input"]), data["output"]))
+
+        new_edges = []
+        for start_id, end_id, position in graph.edges(data = "position"):
+            start_node = self.objects[objects[start_id]]["output"]
+            end_node = self.objects[objects[end_id]]["input" + str(position)]
+            edge = self.diagram.create_line(0, 0, 0, 0, width = 5)
+            self.connect_nodes(edge, start_node, end_node)
+            new_edges.append((objects[start_id], objects[end_id], position))
+
+        self.circuit.add_nodes_from(new_nodes)
+        self.circuit.add_edges_from(new_edges)
+        self.circuit.settle(objects.values())
+        self.update_edges()
+
+
+    def import_netlist(self):
+        """Ask for a .bench or .blif netlist file, then lay it out and draw it on the diagram"""
+
+        path = filedialog.askopenfilename(parent = self.window, title = "Import netlist",
+                                          filetypes = [("Netlists", "*.bench *.blif"), ("All files", "*")])
+        if not path:
+            return
+
+        try:
+            loaded = netlist.load(path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Import netlist", str(error), parent = self.window)
+            return
+
+        self.draw_circuit(loaded.circuit, loaded.inputs)
+
 
     def update_edges(self):
         """
         Update edges to become green if high signal is traveling through it.
+        Update the lightbulbs at the end of edges to match their input.
         """
 
-        high_nodes = []
-        node_data = self.circuit.graph.nodes(data=True)
+        for edge in self.edges:
+            self.update_edge(edge)
+
 
-        for node in node_data:
-            id = node[0]
-            data = node[1]
-            if data["output"] == True:
-                high_nodes.append(id)
+    def update_edges_from(self, changed):
+        """Update only the edges leaving the objects in changed (ids of objects whose outputs changed)"""
 
-        for edge in self.edges:
-            tags = self.diagram.gettags(edge)
-            for tag in tags:
-                if "start_gate" in tag:
-                    id = int(tag.replace("start_gate", ""))
-                    if id in high_nodes:
-                        self.diagram.itemconfig(edge, fill = self.HIGH_COLOR)
-                    else:
-                        self.diagram.itemconfig(edge, fill = self.LOW_COLOR)
-                elif "end_gate" in tag:
-                    id = int(tag.replace("end_gate", ""))
-                    tags = self.diagram.gettags(id)
-                    if "output_obj" in tags:
-                        input = self.circuit.graph.nodes[id]["input"][0]
-                        self.lightbulb_changed(id, input)
+        for object in changed:
+            # Objects deleted after their output changed have no edges left
+            if object not in self.objects or "output" not in self.objects[object]:
+                continue
+            output_node = self.objects[object]["output"]
+            for edge in self.node_edges[output_node]:
+                self.update_edge(edge)
+
+
+    def update_edge(self, edge):
+        """Color an edge by the output of its start object and update the lightbulb it ends at (if any)"""
+
+        circuit_nodes = self.circuit.graph.nodes
+        start_node, end_node = self.edges[edge]
+
+        if circuit_nodes[self.nodes[start_node]]["output"] == True:
+            self.diagram.itemconfig(edge, fill = self.HIGH_COLOR)
+        else:
+            self.diagram.itemconfig(edge, fill = self.LOW_COLOR)
+
+        # Output objects are the only ones with inputs and no logic
+        end_object = self.nodes[end_node]
+        data = circuit_nodes[end_object]
+        if not data["logic"] and data["input"]:
+            self.lightbulb_changed(end_object, data["input"][0])
 
 
     def button_press(self, event, id):
@@ -526,6 +668,7 @@ class Editor:
             # - End node can't be on same gate as start node
             # - End node can't be an output
             # - end node can't already have an input
+            # - Start object can't already drive the end object (the circuit holds one edge per pair)
             # - Currently under mouse
 
             for node in reversed(self.nodes):
@@ -552,28 +695,16 @@ class Editor:
                             elif tag == "has_input":
                                 has_input = True
 
-                        if new_node and new_obj and is_input and not(has_input):
+                        if new_node and new_obj and is_input and not(has_input) and \
+                           not(self.circuit.graph.has_edge(start_object_id, end_obj_id)):
                             valid_edge = True
-                            self.edges.append(edge)
+                            self.connect_nodes(edge, start_node, node)
 
                             # Add edge to circuit
-                            self.circuit.add_edge(start_object_id, end_obj_id, input_position)
-
-                            # Adjust edge coords to final position
-                            x0, y0 = self.find_center_coords(self.diagram.coords(self.grabbed_object))
-                            x1, y1 = self.find_center_coords(self.diagram.coords(node))
-                            self.diagram.coords(edge, x0, y0, x1, y1)
-
-                            # Create tags that describe the two nodes the edge conects
-                            start_tag = "start" + str(self.grabbed_object)
-                            end_tag = "end" + str(node)
-                            self.diagram.addtag_withtag(start_tag, edge)
-                            self.diagram.addtag_withtag(end_tag, edge)
-                            self.diagram.addtag_withtag("start_gate" + str(start_object_id), edge)
-                            self.diagram.addtag_withtag("end_gate" + str(end_obj_id), edge)
-                            self.diagram.addtag_withtag("has_input", node)
+                            changed = self.circuit.add_edge(start_object_id, end_obj_id, input_position)
 
-                            self.update_edges()
+                            self.update_edge(edge)
+                            self.update_edges_from(changed)
 
             if valid_edge == False:
                 self.diagram.delete(self.temp_edge)
@@ -630,6 +761,65 @@ class Editor:
             self.diagram.coords(self.temp_edge, x0, y0, x, y)
     
 
+    def delete_handler(self, event):
+        """Handle <ButtonPress-3> event and delete the edge or object under the mouse"""
+
+        changed = set()
+        for item in self.diagram.find_withtag(tk.CURRENT):
+            if item in self.edges:
+                changed |= self.delete_edge(item)
+            elif item in self.nodes:
+                changed |= self.delete_object(self.nodes[item])
+            elif item in self.objects:
+                changed |= self.delete_object(item)
+
+        # Only the edges leaving objects whose outputs changed need recoloring
+        self.update_edges_from(changed)
+
+
+    def delete_edge(self, edge):
+        """
+        Delete an edge from the diagram and the circuit, freeing the input node it ended at.
+        Returns the set of ids of the objects whose outputs changed.
+        """
+
+        start_node, end_node = self.edges.pop(edge)
+        self.node_edges[start_node].discard(edge)
+        self.node_edges[end_node].discard(edge)
+        self.diagram.dtag(end_node, "has_input")
+        self.diagram.delete(edge)
+
+        end_object = self.nodes[end_node]
+        changed = self.circuit.remove_edge(self.nodes[start_node], end_object)
+
+        # Lightbulbs are only refreshed through their edges, so turn it off here
+        if "output_obj" in self.diagram.gettags(end_object):
+            self.lightbulb_changed(end_object, False)
+
+        return changed
+
+
+    def delete_object(self, object):
+        """
+        Delete an object with its nodes and attached edges from the diagram and the circuit.
+        Returns the set of ids of the objects whose outputs changed.
+        """
+
+        changed = set()
+        for node in self.objects[object].values():
+            for edge in list(self.node_edges[node]):
+                changed |= self.delete_edge(edge)
+            del self.node_edges[node]
+            del self.nodes[node]
+            self.diagram.delete(node)
+
+        del self.objects[object]
+        changed |= self.circuit.remove_node(object)
+        self.diagram.delete(object)
+
+        return changed
+
+
     def do_zoom(self, event):
         """Zoom diagram based on MouseScroll event"""
 
@@ -0,0 +1,338 @@
+"""
+BDD
+Author: Carson Powers
+
+Reduced ordered binary decision diagrams (BDDs) used to evaluate a circuit
+symbolically. Every output of a circuit becomes a node in one shared diagram,
+which lets two circuits be checked for equivalence, and the input vectors that
+drive an output high be counted, without enumerating every input.
+"""
+
+
+import sys
+import networkx as nx
+from collections import OrderedDict
+
+
+class BDD:
+    """
+    A class to represent a manager of shared reduced ordered binary decision diagrams.
+
+    Nodes are never reclaimed, every intermediate result stays in the unique table until the
+    manager is dropped. Building a chain of n gates can leave O(n^2) nodes behind (Ex: an n input
+    parity chain), so use a new manager per comparison rather than one for the whole session.
+    """
+
+    # Ids of the two terminal nodes
+    FALSE = 0
+    TRUE = 1
+
+    # Level given to terminals so they sort below every variable
+    TERMINAL = sys.maxsize
+
+
+    def __init__(self, cache_size = 1 << 18):
+        """
+        Create the terminal nodes, the unique table and the operation cache.
+
+        PARAMETERS
+        ----------
+        cache_size : int
+                     maximum number of ite results kept before the oldest are evicted
+        """
+
+        # Node n is the triple (var[n], low[n], high[n])
+        self.var = [self.TERMINAL, self.TERMINAL]
+        self.low = [self.FALSE, self.TRUE]
+        self.high = [self.FALSE, self.TRUE]
+
+        self.unique = {} # key = (var, low, high), value = node
+        self.cache = OrderedDict() # key = (f, g, h), value = node, oldest first
+        self.cache_size = cache_size
+        self.num_vars = 0
+
+
+    def __len__(self):
+        """Number of nodes in the diagram, terminals included"""
+
+        return len(self.var)
+
+
+    def variable(self, index):
+        """Return the node that is true exactly when variable index is true"""
+
+        self.num_vars = max(self.num_vars, index + 1)
+        return self.make_node(index, self.FALSE, self.TRUE)
+
+
+    def make_node(self, var, low, high):
+        """Return the node (var, low, high), reusing an existing one and skipping redundant tests"""
+
+        if low == high:
+            return low
+
+        key = (var, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+
+    def ite(self, f, g, h):
+        """
+        Return the node for "if f then g else h", the operation every other one is built on.
+        Uses an explicit stack rather than recursion, so diagrams may be deeper than the recursion limit.
+        """
+
+        var, low, high = self.var, self.low, self.high
+        results = []
+        stack = [(f, g, h)]
+
+        while stack:
+            item = stack.pop()
+
+            # Both cofactors are done, combine them
+            if len(item) == 4:
+                key, top = item[:3], item[3]
+                high_result = results.pop()
+                low_result = results.pop()
+                result = self.make_node(top, low_result, high_result)
+
+                # Evict the oldest entry once the cache is full
+                if len(self.cache) >= self.cache_size:
+                    self.cache.popitem(last = False)
+                self.cache[key] = result
+                results.append(result)
+                continue
+
+            f, g, h = item
+
+            # Terminal cases
+            if f == self.TRUE:
+                results.append(g)
+            elif f == self.FALSE:
+                results.append(h)
+            elif g == h:
+                results.append(g)
+            elif g == self.TRUE and h == self.FALSE:
+                results.append(f)
+            elif item in self.cache:
+                results.append(self.cache[item])
+            else:
+                # Split on the top-most variable of the three operands, the low cofactor is solved first
+                top = min(var[f], var[g], var[h])
+                f0, f1 = (low[f], high[f]) if var[f] == top else (f, f)
+                g0, g1 = (low[g], high[g]) if var[g] == top else (g, g)
+                h0, h1 = (low[h], high[h]) if var[h] == top else (h, h)
+
+                stack.append((f, g, h, top))
+                stack.append((f1, g1, h1))
+                stack.append((f0, g0, h0))
+
+        return results[0]
+
+
+    def negate(self, f):
+        """Return the node for not f"""
+
+        return self.ite(f, self.FALSE, self.TRUE)
+
+
+    def apply(self, logic, inputs):
+        """
+        Apply a gate from the circuit logic table to the nodes in inputs.
+
+        PARAMETERS
+        ----------
+        logic : string
+                name of the gate ("and", "or", "not", ...)
+        inputs : list
+                 one node per gate input
+        """
+
+        if logic == "buffer":
+            return inputs[0]
+        if logic == "not":
+            return self.negate(inputs[0])
+
+        f, g = inputs
+        if logic == "and":
+            return self.ite(f, g, self.FALSE)
+        if logic == "or":
+            return self.ite(f, self.TRUE, g)
+        if logic == "xor":
+            return self.ite(f, self.negate(g), g)
+        if logic == "xnor":
+            return self.ite(f, g, self.negate(g))
+        if logic == "nand":
+            return self.ite(f, self.negate(g), self.TRUE)
+        if logic == "nor":
+            return self.ite(f, self.FALSE, self.negate(g))
+
+        raise ValueError("unknown logic type " + repr(logic))
+
+
+    def sat_count(self, f, num_vars = None):
+        """Count the assignments of the first num_vars variables that make f true"""
+
+        if num_vars is None:
+            num_vars = self.num_vars
+
+        def level(node):
+            return num_vars if node <= self.TRUE else self.var[node]
+
+        # Children always have lower ids than their parents, so count the nodes under f in id order
+        reachable = set()
+        stack = [f]
+        while stack:
+            node = stack.pop()
+            if node > self.TRUE and node not in reachable:
+                reachable.add(node)
+                stack.append(self.low[node])
+                stack.append(self.high[node])
+
+        # Assignments of the variables from level(node) down that reach TRUE
+        counts = {self.FALSE: 0, self.TRUE: 1}
+        for node in sorted(reachable):
+            low, high = self.low[node], self.high[node]
+            skip_low = level(low) - level(node) - 1
+            skip_high = level(high) - level(node) - 1
+            counts[node] = (counts[low] << skip_low) + (counts[high] << skip_high)
+
+        return counts[f] << level(f)
+
+
+    def satisfy(self, f):
+        """
+        Return one assignment that makes f true as a dict of variable index to bool,
+        or None if f is never true. Variables left out may take either value.
+        """
+
+        if f == self.FALSE:
+            return None
+
+        assignment = {}
+        while f > self.TRUE:
+            if self.low[f] != self.FALSE:
+                assignment[self.var[f]] = False
+                f = self.low[f]
+            else:
+                assignment[self.var[f]] = True
+                f = self.high[f]
+        return assignment
+
+
+    def clear_cache(self):
+        """Drop every cached operation result"""
+
+        self.cache.clear()
+
+
+
+def circuit_outputs(circuit):
+    """Return the ids of the output objects (no logic, a single input, nothing driven)"""
+
+    graph = circuit.graph
+    return [id for id, data in graph.nodes(data = True)
+            if not data["logic"] and len(data["input"]) == 1 and graph.out_degree(id) == 0]
+
+
+def build(manager, circuit, inputs, outputs = None):
+    """
+    Build each output of circuit as a node in the diagram of manager.
+
+    PARAMETERS
+    ----------
+    manager : BDD
+              diagram the nodes are added to, shared between calls
+    circuit : Circuit
+              circuit to evaluate, must not contain feedback loops
+    inputs : list
+             ids of the nodes to treat as variables, input i becomes variable i (Ex: Netlist.inputs).
+             Other nodes without inputs are constants and keep their output, as switches and
+             constants can't be told apart in the graph.
+    outputs : list
+              ids of the nodes to return. Defaults to circuit_outputs(circuit)
+
+    RETURNS
+    -------
+    dict : key = output id, value = node in manager
+    """
+
+    graph = circuit.graph
+    if outputs is None:
+        outputs = circuit_outputs(circuit)
+
+    try:
+        order = list(nx.topological_sort(graph))
+    except nx.NetworkXUnfeasible:
+        raise ValueError("cannot evaluate a circuit with feedback loops symbolically")
+
+    values = {id: manager.variable(i) for i, id in enumerate(inputs)}
+
+    for id in order:
+        if id in values:
+            continue
+
+        data = graph.nodes[id]
+        if not data["input"]:
+            values[id] = manager.TRUE if data["output"] else manager.FALSE
+            continue
+
+        # Unconnected inputs stay low, as they do in the circuit
+        operands = [manager.FALSE] * len(data["input"])
+        for start_id, _, position in graph.in_edges(id, data = "position"):
+            operands[position] = values[start_id]
+
+        if data["logic"]:
+            values[id] = manager.apply(data["logic"], operands)
+        else:
+            values[id] = operands[0]
+
+    return {id: values[id] for id in outputs}
+
+
+def counterexample(circuit_a, circuit_b, inputs_a, inputs_b,
+                   outputs_a = None, outputs_b = None, manager = None):
+    """
+    Compare two circuits whose inputs (ids of the nodes to treat as variables)
+    and outputs are matched up by position.
+
+    RETURNS
+    -------
+    list : an input vector (one bool per input) on which some output differs,
+           or None if the circuits are equivalent
+    """
+
+    if outputs_a is None:
+        outputs_a = circuit_outputs(circuit_a)
+    if outputs_b is None:
+        outputs_b = circuit_outputs(circuit_b)
+
+    if len(inputs_a) != len(inputs_b) or len(outputs_a) != len(outputs_b):
+        raise ValueError("circuits must have the same number of inputs and outputs")
+
+    if manager is None:
+        manager = BDD()
+    built_a = build(manager, circuit_a, inputs_a, outputs_a)
+    built_b = build(manager, circuit_b, inputs_b, outputs_b)
+
+    # Any assignment where some pair of outputs differs is a counterexample
+    differ = manager.FALSE
+    for out_a, out_b in zip(outputs_a, outputs_b):
+        differ = manager.ite(differ, manager.TRUE, manager.apply("xor", [built_a[out_a], built_b[out_b]]))
+
+    assignment = manager.satisfy(differ)
+    if assignment is None:
+        return None
+    return [assignment.get(i, False) for i in range(len(inputs_a))]
+
+
+def equivalent(circuit_a, circuit_b, inputs_a, inputs_b, **kwargs):
+    """Return True if both circuits compute the same outputs for every input vector"""
+
+    return counterexample(circuit_a, circuit_b, inputs_a, inputs_b, **kwargs) is None
@@ -7,16 +7,21 @@ that represents the logix gate diagram in logix.
 """
 
 
+import heapq
 import networkx as nx
 
 
 class Circuit:
     """A class to represent a circuit object. (graph of connected inputs, gates, and outputs"""
 
+    # Times a node may be evaluated in one settle before a feedback loop is treated as oscillating
+    MAX_EVALUATIONS = 64
+
     def __init__(self):
         """Initialize the circuit graph and define logic functions."""
 
         self.graph = nx.DiGraph()
+        self.rank = None # topological rank of each node, recomputed after the graph changes
 
         self.logic = {
             "or": (lambda in1, in2: in1 or in2),
@@ -29,6 +34,18 @@ class Circuit:
             "buffer": (lambda in1: in1)
         }
 
+        # Bitwise versions of the logic functions, bit k of each int is the value in input vector k
+        self.word_logic = {
+            "or": (lambda in1, in2, mask: in1 | in2),
+            "and": (lambda in1, in2, mask: in1 & in2),
+            "not": (lambda in1, mask: in1 ^ mask),
+            "nor": (lambda in1, in2, mask: (in1 | in2) ^ mask),
+            "nand": (lambda in1, in2, mask: (in1 & in2) ^ mask),
+            "xor": (lambda in1, in2, mask: in1 ^ in2),
+            "xnor": (lambda in1, in2, mask: in1 ^ in2 ^ mask),
+            "buffer": (lambda in1, mask: in1)
+        }
+
 
     def change_output(self, id, val):
         """
@@ -37,21 +54,7 @@ class Circuit:
         """
 
         self.graph.nodes[id]["output"] = val
-        self.update(id)
-
-
-    def update(self, start_id):
-        """Recursive function that updates all out nodes"""
-
-        # Find out edges
-        for edge in self.graph.out_edges(start_id):
-            curr_output = self.graph.nodes[start_id]["output"] # Current output of node start_id
-            input_position = self.graph.edges[edge[0], edge[1]]["position"] # "Position" (top or bottom of gate = 0 or 1) of input
-            out_node_id = edge[1] # Out node id based on out edge tuple
-
-            # Applt logic to node, run update on each out node
-            self.logicize_node(out_node_id, input_position, curr_output)
-            self.update(out_node_id)
+        self.settle_from([id])
 
 
     def logicize_node(self, id, input_position, input_value):
@@ -64,15 +67,22 @@ class Circuit:
 
         # Only apply logic if it has any (only gates do)
         if node["logic"]: 
-            logic_type = node["logic"]
-            inputs = node["input"]
-            
-            # Set output
-            if len(inputs) == 2:
-                output = self.logic[logic_type](inputs[0], inputs[1])
-            else:
-                output = self.logic[logic_type](inputs[0])
-            self.graph.nodes[id]["output"] = output
+            self.evaluate_node(id)
+
+
+    def evaluate_node(self, id):
+        """Set the output of a gate from its current inputs"""
+
+        node = self.graph.nodes[id]
+        logic_type = node["logic"]
+        inputs = node["input"]
+
+        # Set output
+        if len(inputs) == 2:
+            output = self.logic[logic_type](inputs[0], inputs[1])
+        else:
+            output = self.logic[logic_type](inputs[0])
+        node["output"] = output
 
 
     def add_node(self, id, logic, num_inputs, output = False):
@@ -81,15 +91,244 @@ class Circuit:
         Create attributes for the inputs and output.
         """
 
+        # A new node drives nothing yet, so there is nothing to propagate
         self.graph.add_node(id, logic = logic, input = [False] * num_inputs, output = output)
-        self.update(id)
+        self.rank = None
     
 
     def add_edge(self, start_id, end_id, position):
         """
         Add edge to the directed graph given ids of start and end nodes.
         "Position" (0 or 1) denotes if the edge is going to a top or bottom input of a gate.
+        Returns the set of ids of the nodes whose outputs changed.
         """
 
         self.graph.add_edge(start_id, end_id, position = position)
-        self.update(start_id)
\ No newline at end of file
+        self.rank = None
+
+        end_node = self.graph.nodes[end_id]
+        old_output = end_node["output"]
+        self.logicize_node(end_id, position, self.graph.nodes[start_id]["output"])
+        if end_node["output"] == old_output:
+            return set()
+
+        changed = self.settle_from([end_id])
+        changed.add(end_id)
+        return changed
+
+
+    def reset_input(self, id, input_position):
+        """
+        Return the input of a node at input_position to its default (low).
+        Only re-propagate through the fanout of the node if its output changed.
+        Returns the set of ids of the nodes whose outputs changed.
+        """
+
+        old_output = self.graph.nodes[id]["output"]
+        self.logicize_node(id, input_position, False)
+        if self.graph.nodes[id]["output"] == old_output:
+            return set()
+
+        changed = self.settle_from([id])
+        changed.add(id)
+        return changed
+
+
+    def remove_edge(self, start_id, end_id):
+        """
+        Remove the edge between the start and end nodes and reset the input it was driving.
+        Returns the set of ids of the nodes whose outputs changed.
+        """
+
+        if not self.graph.has_edge(start_id, end_id):
+            return set()
+
+        position = self.graph.edges[start_id, end_id]["position"]
+        self.graph.remove_edge(start_id, end_id)
+        # Removing an edge never breaks a topological order, so the ranks are kept
+        return self.reset_input(end_id, position)
+
+
+    def remove_node(self, id):
+        """
+        Remove node id with its edges and reset every input it was driving.
+        Returns the set of ids of the nodes whose outputs changed.
+        """
+
+        out_edges = list(self.graph.out_edges(id, data = "position"))
+        self.graph.remove_node(id)
+        if self.rank is not None:
+            self.rank.pop(id, None)
+
+        changed = set()
+        for _, end_id, input_position in out_edges:
+            changed |= self.reset_input(end_id, input_position)
+        return changed
+
+
+
+    def add_nodes_from(self, nodes):
+        """
+        Add many nodes at once without propagating, for building large circuits.
+        Each node is a tuple (id, logic, num_inputs, output). Call settle() once all edges are added.
+        """
+
+        self.graph.add_nodes_from((id, {"logic": logic, "input": [False] * num_inputs, "output": output})
+                                  for id, logic, num_inputs, output in nodes)
+        self.rank = None
+
+
+    def add_edges_from(self, edges):
+        """
+        Add many edges at once without propagating, for building large circuits.
+        Each edge is a tuple (start_id, end_id, position). Call settle() once all edges are added.
+        """
+
+        self.graph.add_edges_from((start_id, end_id, {"position": position})
+                                  for start_id, end_id, position in edges)
+        self.rank = None
+
+
+    def settle(self, ids = None):
+        """
+        Evaluate each node once in topological order, so every input and output agrees with the graph.
+        Only the nodes in ids are evaluated if given. Raises ValueError if they form a feedback loop.
+        """
+
+        graph = self.graph
+        subgraph = graph if ids is None else graph.subgraph(ids)
+
+        try:
+            order = list(nx.topological_sort(subgraph))
+        except nx.NetworkXUnfeasible:
+            raise ValueError("cannot settle a circuit with feedback loops")
+
+        for id in order:
+            node = graph.nodes[id]
+            for start_id, _, position in graph.in_edges(id, data = "position"):
+                node["input"][position] = graph.nodes[start_id]["output"]
+            if node["logic"]:
+                self.evaluate_node(id)
+
+
+    def ranks(self):
+        """
+        Return the position of each node in a topological order of the graph, ignoring the
+        back edges of feedback loops. Kept until the graph changes.
+        """
+
+        if self.rank is None:
+            # Reverse DFS postorder is a topological order once back edges are ignored
+            order = list(nx.dfs_postorder_nodes(self.graph))
+            order.reverse()
+            self.rank = {id: i for i, id in enumerate(order)}
+        return self.rank
+
+
+    def settle_from(self, ids, rank = None):
+        """
+        Re-propagate after the outputs of the nodes in ids were changed directly (Ex: many input switches at once).
+        Nodes are evaluated in topological rank order, and only while their outputs keep changing,
+        so each node in the fanout cone is evaluated at most once per change in a circuit without loops.
+        Raises ValueError if a feedback loop keeps oscillating (Ex: an XOR driving its own input).
+
+        PARAMETERS
+        ----------
+        ids : iterable
+              ids of the nodes whose outputs changed
+        rank : dict
+               key = node id, value = position of the node in a topological order of the graph.
+               Defaults to ranks()
+
+        RETURNS
+        -------
+        set : ids of the nodes whose outputs changed, not counting those in ids
+        """
+
+        graph = self.graph
+        if rank is None:
+            rank = self.ranks()
+        queue = []
+        queued = set()
+        changed = set()
+        evaluations = {} # key = node id, value = times evaluated
+
+        def push_fanout(id):
+            for end_id in graph.succ[id]:
+                if end_id not in queued:
+                    queued.add(end_id)
+                    heapq.heappush(queue, (rank[end_id], end_id))
+
+        for id in ids:
+            push_fanout(id)
+
+        while queue:
+            _, id = heapq.heappop(queue)
+            queued.discard(id)
+
+            count = evaluations.get(id, 0) + 1
+            if count > self.MAX_EVALUATIONS:
+                raise ValueError("circuit does not settle, feedback loop through " + str(id) + " oscillates")
+            evaluations[id] = count
+
+            node = graph.nodes[id]
+            old_output = node["output"]
+            for start_id, edge in graph.pred[id].items():
+                node["input"][edge["position"]] = graph.nodes[start_id]["output"]
+            if node["logic"]:
+                self.evaluate_node(id)
+                if node["output"] != old_output:
+                    changed.add(id)
+                    push_fanout(id)
+
+        return changed
+
+
+
+    def evaluate_words(self, words, mask, order = None):
+        """
+        Evaluate the circuit on many input vectors at once without changing its state.
+
+        PARAMETERS
+        ----------
+        words : dict
+                key = input node id, value = int whose bit k is the input value in vector k
+        mask : int
+               int with a bit set for every vector
+        order : list
+                topological order of the graph, computed if not given
+
+        RETURNS
+        -------
+        dict : key = node id, value = int whose bit k is the node output in vector k
+        """
+
+        graph = self.graph
+        if order is None:
+            try:
+                order = list(nx.topological_sort(graph))
+            except nx.NetworkXUnfeasible:
+                raise ValueError("cannot evaluate a circuit with feedback loops")
+
+        values = {}
+        for id in order:
+            if id in words:
+                values[id] = words[id]
+                continue
+
+            data = graph.nodes[id]
+            if not data["input"]:
+                values[id] = mask if data["output"] else 0
+                continue
+
+            # Unconnected inputs stay low
+            inputs = [0] * len(data["input"])
+            for start_id, edge in graph.pred[id].items():
+                inputs[edge["position"]] = values[start_id]
+
+            if data["logic"]:
+                values[id] = self.word_logic[data["logic"]](*inputs, mask)
+            else:
+                values[id] = inputs[0]
+
+        return values
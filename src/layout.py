@@ -0,0 +1,115 @@
+"""
+Layout
+Author: Carson Powers
+
+Automatic layered layout for circuits that were imported or generated rather than drawn.
+Nodes are placed in columns by topological level, then the rows within each column are
+reordered with barycenter sweeps to reduce edge crossings.
+"""
+
+
+import networkx as nx
+
+
+def levels(graph):
+    """
+    Assign every node of graph a column, one past the furthest of its inputs.
+    Edges that close a feedback loop are ignored, and nodes that drive nothing are put in the last column.
+
+    RETURNS
+    -------
+    dict : key = node, value = column (int)
+    """
+
+    # Reverse DFS postorder is a topological order once the back edges of loops are ignored
+    order = list(nx.dfs_postorder_nodes(graph))
+    order.reverse()
+    rank = {node: i for i, node in enumerate(order)}
+
+    level = {}
+    for node in order:
+        level[node] = max((level[start] + 1 for start in graph.predecessors(node) if rank[start] < rank[node]),
+                          default = 0)
+
+    # Line outputs up in the final column
+    last = max(level.values(), default = 0)
+    for node in order:
+        if graph.in_degree(node) and not graph.out_degree(node):
+            level[node] = last
+
+    return level
+
+
+def order_rows(graph, level, passes = 4):
+    """
+    Order the nodes in each column to reduce crossings, alternating sweeps that sort each column
+    by the average row of its inputs (left to right) and of its outputs (right to left).
+
+    RETURNS
+    -------
+    list : one list of nodes per column, top to bottom
+    """
+
+    columns = [[] for _ in range(max(level.values(), default = -1) + 1)]
+    for node in level:
+        columns[level[node]].append(node)
+
+    row = {}
+    for column in columns:
+        for i, node in enumerate(column):
+            row[node] = i
+
+    for sweep in range(passes):
+        if sweep % 2 == 0:
+            sweep_columns, neighbors = columns[1:], graph.predecessors
+        else:
+            sweep_columns, neighbors = reversed(columns[:-1]), graph.successors
+
+        for column in sweep_columns:
+            barycenter = {}
+            for node in column:
+                rows = [row[other] for other in neighbors(node)]
+                barycenter[node] = sum(rows) / len(rows) if rows else row[node]
+
+            # Stable sort keeps the previous order between ties
+            column.sort(key = barycenter.__getitem__)
+            for i, node in enumerate(column):
+                row[node] = i
+
+    return columns
+
+
+def layered(graph, origin = (0, 0), column_width = 250, row_height = 125, passes = 4):
+    """
+    Lay out graph in columns by topological level.
+
+    PARAMETERS
+    ----------
+    graph : networkx.DiGraph
+            graph of the circuit to lay out
+    origin : tuple
+             (x, y) center of the top left node (pixels)
+    column_width : int
+                   distance between the centers of neighbouring columns (pixels)
+    row_height : int
+                 distance between the centers of neighbouring rows (pixels)
+    passes : int
+             number of crossing reduction sweeps
+
+    RETURNS
+    -------
+    dict : key = node, value = (x, y) center of the node (pixels)
+    """
+
+    columns = order_rows(graph, levels(graph), passes)
+    x0, y0 = origin
+    tallest = max((len(column) for column in columns), default = 0)
+
+    positions = {}
+    for i, column in enumerate(columns):
+        # Center each column against the tallest one
+        top = y0 + (tallest - len(column)) * row_height / 2
+        for j, node in enumerate(column):
+            positions[node] = (x0 + i * column_width, top + j * row_height)
+
+    return positions
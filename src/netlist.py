@@ -0,0 +1,419 @@
+"""
+Netlist
+Author: Carson Powers
+
+Streaming importers for gate-level netlists, the ISCAS .bench format and a
+subset of BLIF (.model, .inputs, .outputs, .names, .latch, .end).
+Netlists are read line by line and built into a Circuit through its bulk
+construction path, so benchmark circuits with thousands of gates load in one pass.
+"""
+
+
+from src.circuit import Circuit
+
+import sys
+import time
+import tracemalloc
+
+
+# .bench gate names mapped to the circuit logic table
+BENCH_GATES = {
+    "AND": "and",
+    "NAND": "nand",
+    "OR": "or",
+    "NOR": "nor",
+    "XOR": "xor",
+    "XNOR": "xnor",
+    "NOT": "not",
+    "BUFF": "buffer",
+    "BUF": "buffer"
+}
+
+
+
+class Netlist:
+    """A class to represent a netlist being read into a circuit."""
+
+    # Gates with more than two inputs are split into a tree of these two input gates,
+    # the gate at the root applies the inversion (if any)
+    TREE_LOGIC = {"and": "and", "nand": "and", "or": "or", "nor": "or", "xor": "xor", "xnor": "xor"}
+
+    # Two input gates given a single input reduce to a buffer or an inverter
+    SINGLE_LOGIC = {"and": "buffer", "or": "buffer", "xor": "buffer", "buffer": "buffer",
+                    "nand": "not", "nor": "not", "xnor": "not", "not": "not"}
+
+
+    def __init__(self):
+        """Create an empty circuit and the lists the netlist is collected in."""
+
+        self.circuit = Circuit()
+        self.inputs = [] # ids of primary inputs and latch outputs
+        self.outputs = [] # ids of the output nodes of primary outputs and latch inputs
+        self.latches = [] # (d, q) signal names of each latch
+        self.inverted = set() # ids of inverters already added for BLIF cover literals
+
+        # Collected while reading, then added to the circuit in bulk by finish()
+        self.nodes = []
+        self.edges = []
+
+        self.stats = {"lines": 0}
+
+
+    def add_input(self, name, value = False):
+        """Add a primary input (a node with no inputs, like a switch)"""
+
+        self.nodes.append((name, 0, 0, value))
+        self.inputs.append(name)
+
+
+    def add_output(self, name, id = None):
+        """Add an output node (like a lightbulb) driven by signal name"""
+
+        if id is None:
+            id = ("out", name)
+        self.nodes.append((id, 0, 1, False))
+        self.edges.append((name, id, 0))
+        self.outputs.append(id)
+
+
+    def add_constant(self, name, value):
+        """Add a signal that is always value"""
+
+        self.nodes.append((name, 0, 0, value))
+
+
+    def add_gate(self, name, logic, fanin):
+        """
+        Add gate name driven by the signals in fanin.
+
+        PARAMETERS
+        ----------
+        name : string
+               name of the signal the gate drives
+        logic : string
+                logic table entry of the gate
+        fanin : list
+                names of the signals driving the gate inputs
+        """
+
+        if len(fanin) == 1:
+            logic = self.SINGLE_LOGIC[logic]
+        elif logic in ("not", "buffer"):
+            raise ValueError(logic + " gate " + str(name) + " must have exactly one input")
+
+        # The graph holds one edge per pair of signals, so a repeated input goes through a buffer
+        distinct = []
+        for i, signal in enumerate(fanin):
+            if signal in distinct:
+                buffered = (name, "fanin", i)
+                self.nodes.append((buffered, "buffer", 1, False))
+                self.edges.append((signal, buffered, 0))
+                signal = buffered
+            distinct.append(signal)
+        fanin = distinct
+
+        # Pair up inputs until two are left for the gate itself
+        count = 0
+        while len(fanin) > 2:
+            paired = []
+            for i in range(0, len(fanin) - 1, 2):
+                id = (name, count)
+                count += 1
+                self.nodes.append((id, self.TREE_LOGIC[logic], 2, False))
+                self.edges.append((fanin[i], id, 0))
+                self.edges.append((fanin[i + 1], id, 1))
+                paired.append(id)
+            if len(fanin) % 2:
+                paired.append(fanin[-1])
+            fanin = paired
+
+        self.nodes.append((name, logic, len(fanin), False))
+        for position, start in enumerate(fanin):
+            self.edges.append((start, name, position))
+
+
+    def add_latch(self, d, q, value = False):
+        """
+        Add a latch from signal d to signal q. The latch is cut so the circuit stays combinational,
+        q becomes an input and d drives an output node.
+        """
+
+        self.add_input(q, value)
+        self.add_output(d, ("latch", q))
+        self.latches.append((d, q))
+
+
+    def finish(self):
+        """Add the collected nodes and edges to the circuit and settle it"""
+
+        circuit = self.circuit
+
+        defined = set()
+        for id, _, _, _ in self.nodes:
+            if id in defined:
+                raise ValueError("signal " + str(id) + " defined twice")
+            defined.add(id)
+        for start, end, _ in self.edges:
+            if start not in defined:
+                raise ValueError("signal " + str(start) + " is used but never defined")
+
+        circuit.add_nodes_from(self.nodes)
+        circuit.add_edges_from(self.edges)
+        circuit.settle()
+
+        self.stats["inputs"] = len(self.inputs)
+        self.stats["outputs"] = len(self.outputs)
+        self.stats["nodes"] = circuit.graph.number_of_nodes()
+        self.stats["edges"] = circuit.graph.number_of_edges()
+        self.nodes = []
+        self.edges = []
+
+        return self
+
+
+
+def read_bench(lines):
+    """
+    Read an ISCAS .bench netlist from an iterable of lines (such as an open file).
+
+    Example:
+        INPUT(G1)
+        OUTPUT(G3)
+        G3 = NAND(G1, G2)
+    """
+
+    netlist = Netlist()
+
+    for number, line in enumerate(lines, 1):
+        netlist.stats["lines"] = number
+
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+
+        try:
+            if "=" in line:
+                name, expression = line.split("=", 1)
+                gate, arguments = expression.split("(", 1)
+                name = name.strip()
+                gate = gate.strip().upper()
+                fanin = [argument.strip() for argument in arguments.rsplit(")", 1)[0].split(",")]
+
+                if gate == "DFF":
+                    netlist.add_latch(fanin[0], name)
+                elif gate in BENCH_GATES:
+                    netlist.add_gate(name, BENCH_GATES[gate], fanin)
+                else:
+                    raise ValueError("unknown gate type " + gate)
+            else:
+                keyword, argument = line.split("(", 1)
+                keyword = keyword.strip().upper()
+                argument = argument.rsplit(")", 1)[0].strip()
+
+                if keyword == "INPUT":
+                    netlist.add_input(argument)
+                elif keyword == "OUTPUT":
+                    netlist.add_output(argument)
+                else:
+                    raise ValueError("unknown statement " + keyword)
+        except ValueError as error:
+            raise ValueError("line " + str(number) + ": " + str(error))
+
+    return netlist.finish()
+
+
+def read_blif(lines):
+    """
+    Read a single model BLIF netlist from an iterable of lines (such as an open file).
+    Supports .model, .inputs, .outputs, .names, .latch and .end.
+
+    Example:
+        .model half_adder
+        .inputs a b
+        .outputs s c
+        .names a b s
+        01 1
+        10 1
+        .names a b c
+        11 1
+        .end
+    """
+
+    netlist = Netlist()
+    cover = None # [signal names, rows] of the .names block being read
+    statement = ""
+
+    for number, line in enumerate(lines, 1):
+        netlist.stats["lines"] = number
+
+        # Join lines continued with a backslash
+        line = statement + line.split("#", 1)[0].strip()
+        if line.endswith("\\"):
+            statement = line[:-1] + " "
+            continue
+        statement = ""
+
+        words = line.split()
+        if not words:
+            continue
+
+        try:
+            if not words[0].startswith("."):
+                if cover is None:
+                    raise ValueError("cover row outside of a .names block")
+                cover[1].append(words)
+                continue
+
+            if cover is not None:
+                add_cover(netlist, *cover)
+                cover = None
+
+            keyword = words[0]
+            if keyword == ".names":
+                cover = [words[1:], []]
+            elif keyword == ".inputs":
+                for name in words[1:]:
+                    netlist.add_input(name)
+            elif keyword == ".outputs":
+                for name in words[1:]:
+                    netlist.add_output(name)
+            elif keyword == ".latch":
+                # .latch input output [type control] [init], inits 2 and 3 (don't care, unknown) start low
+                netlist.add_latch(words[1], words[2], len(words) in (4, 6) and words[-1] == "1")
+            elif keyword == ".model":
+                if "model" in netlist.stats:
+                    raise ValueError("only a single model is supported")
+                netlist.stats["model"] = words[1] if len(words) > 1 else ""
+            elif keyword == ".end":
+                break
+            else:
+                raise ValueError("unsupported statement " + keyword)
+        except (ValueError, IndexError) as error:
+            raise ValueError("line " + str(number) + ": " + str(error))
+
+    if cover is not None:
+        add_cover(netlist, *cover)
+
+    return netlist.finish()
+
+
+def add_cover(netlist, signals, rows):
+    """
+    Add the single output cover of a BLIF .names block to netlist.
+    Covers matching a gate in the logic table become that gate, others become a sum of products.
+    """
+
+    if not signals:
+        raise ValueError(".names needs at least an output signal")
+
+    fanin, name = signals[:-1], signals[-1]
+
+    # Rows are "cube value", or just "value" when there are no inputs
+    if not fanin:
+        netlist.add_constant(name, any(row[-1] == "1" for row in rows))
+        return
+    if not rows:
+        netlist.add_constant(name, False)
+        return
+
+    for row in rows:
+        if len(row) != 2 or len(row[0]) != len(fanin) or row[1] != rows[0][1]:
+            raise ValueError("malformed cover row " + " ".join(row))
+    cubes = [row[0] for row in rows]
+    on_set = rows[0][1] == "1"
+
+    # Use a single gate when the cover has the same truth table as one
+    if len(fanin) <= 2:
+        vectors = [[bool(i >> k & 1) for k in reversed(range(len(fanin)))] for i in range(2 ** len(fanin))]
+        table = [on_set == any(all(c == "-" or (c == "1") == v for c, v in zip(cube, vector)) for cube in cubes)
+                 for vector in vectors]
+
+        for logic, function in netlist.circuit.logic.items():
+            if function.__code__.co_argcount == len(fanin) and \
+               [bool(function(*vector)) for vector in vectors] == table:
+                netlist.add_gate(name, logic, list(fanin))
+                return
+
+    # Otherwise build an OR of one AND per cube, inverted for an off-set cover
+    terms = []
+    for number, cube in enumerate(cubes):
+        literals = []
+        for signal, c in zip(fanin, cube):
+            if c == "1":
+                literals.append(signal)
+            elif c == "0":
+                inverted = (signal, "not")
+                if inverted not in netlist.inverted:
+                    netlist.add_gate(inverted, "not", [signal])
+                    netlist.inverted.add(inverted)
+                literals.append(inverted)
+
+        if not literals:
+            # A cube with no literals covers every input vector
+            netlist.add_constant(name, on_set)
+            return
+        if len(literals) == 1:
+            terms.append(literals[0])
+        else:
+            term = (name, "cube", number)
+            netlist.add_gate(term, "and", literals)
+            terms.append(term)
+
+    netlist.add_gate(name, "or" if on_set else "nor", terms)
+
+
+READERS = {"bench": read_bench, "blif": read_blif}
+
+
+def load(path, format = None, trace_memory = False):
+    """
+    Load the netlist at path into a circuit.
+
+    PARAMETERS
+    ----------
+    path : string
+           path of the netlist file
+    format : string
+             "bench" or "blif", chosen by the file extension if not given
+    trace_memory : bool
+                   record peak memory use while loading (slows loading down)
+
+    RETURNS
+    -------
+    Netlist : with the circuit, its inputs and outputs, and stats on the parse time and memory
+    """
+
+    if format is None:
+        format = "blif" if path.lower().endswith(".blif") else "bench"
+    if format not in READERS:
+        raise ValueError("unknown netlist format " + repr(format))
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        with open(path) as file:
+            netlist = READERS[format](file)
+
+        netlist.stats["seconds"] = time.perf_counter() - start
+        if trace_memory:
+            netlist.stats["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return netlist
+
+
+def main():
+    """Load each netlist given on the command line and report its stats"""
+
+    for path in sys.argv[1:]:
+        stats = load(path, trace_memory = True).stats
+        print(path)
+        print("  {lines} lines, {inputs} inputs, {outputs} outputs, {nodes} nodes, {edges} edges".format(**stats))
+        print("  parsed in {:.3f} s, peak memory {:.1f} MiB".format(stats["seconds"], stats["peak_bytes"] / 2 ** 20))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,493 @@
+"""
+Server
+Author: Carson Powers
+
+Optional server mode that hosts named circuits for other processes on the same host.
+Clients connect over a Unix or TCP socket and send JSON requests, either one per line
+or each prefixed by its length as a 4 byte big-endian int. Requests on a connection may
+be pipelined and are answered in order.
+
+There is no separate binary encoding of the requests, length-prefixed messages are still JSON.
+Evaluate takes vectors as int masks instead, which keeps large batches compact.
+
+Requests are objects with an "op" and, for most ops, a "circuit" name. An "id" is echoed back.
+    load      {"path": file} or {"text": netlist, "format": "bench" | "blif"}
+    set       {"values": {input name: bool}}, applied at the next settle, read or event loop pass
+    settle    apply pending values
+    read      {"names": [output names]} (optional), returns {"outputs": {name: bool}}
+    evaluate  {"vectors": [...], "inputs": [input names]} (optional), evaluates without changing state.
+              Vectors are lists of bools or int masks (bit i = input i), outputs come back the same way.
+    unload, list, stats
+
+Run with: python -m src.server [--unix PATH | --host HOST --port PORT]
+Benchmark with: python -m src.server --bench [NETLIST] [--framed] [--requests N] [--vectors N]
+"""
+
+
+import src.netlist as netlist
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import networkx as nx
+
+
+# Messages are kept below 16 MiB, so a framed connection always starts with a zero byte
+MAX_FRAME = 1 << 24
+
+
+
+def label(id):
+    """Name a circuit node id for clients, ("out", "G22") becomes "G22" and ("latch", "G5") becomes "latch:G5" """
+
+    if isinstance(id, tuple):
+        if id[0] == "out":
+            return str(id[1])
+        return ":".join(str(part) for part in id)
+    return str(id)
+
+
+def is_bit(value):
+    """Return True if value is a bool or the int 0 or 1"""
+
+    return isinstance(value, (bool, int)) and value in (0, 1)
+
+
+def field(request, key, kind, optional = False):
+    """Return request[key] after checking it is a kind, raising ValueError if not (or if missing and not optional)"""
+
+    value = request.get(key)
+    if value is None:
+        if optional:
+            return None
+        raise ValueError("missing " + repr(key))
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError(repr(key) + " must be a " + kind.__name__)
+    return value
+
+
+def transpose(masks, width):
+    """
+    Transpose a list of ints of width bits, bit i of result k is bit k of masks[i].
+    Turns one mask per vector into one word per input, and words back into masks.
+    """
+
+    if not masks:
+        return [0] * width
+
+    rows = [format(mask, "0" + str(width) + "b")[::-1] for mask in masks]
+    return [int("".join(column)[::-1], 2) for column in zip(*rows)]
+
+
+
+class Hosted:
+    """A class to represent a circuit hosted by the server."""
+
+    def __init__(self, loaded):
+        """Host the circuit of a loaded netlist."""
+
+        self.circuit = loaded.circuit
+        self.inputs = {label(id): id for id in loaded.inputs} # key = name, value = node id
+        self.outputs = {label(id): id for id in loaded.outputs}
+        self.order = list(nx.topological_sort(self.circuit.graph))
+        self.rank = {id: i for i, id in enumerate(self.order)}
+
+        self.pending = {} # key = node id, value = input value waiting for the next settle
+        self.flush_scheduled = False
+        self.stats = {"sets": 0, "settles": 0, "vectors": 0}
+
+
+    def set(self, values):
+        """Queue new input values, later values for the same input replace earlier ones"""
+
+        # Check every value first so a bad request changes nothing
+        for name, value in values.items():
+            if name not in self.inputs:
+                raise ValueError("unknown input " + repr(name))
+            if not is_bit(value):
+                raise ValueError("value of " + repr(name) + " must be a bool or 0/1")
+
+        for name, value in values.items():
+            self.pending[self.inputs[name]] = bool(value)
+        self.stats["sets"] += 1
+
+
+    def flush(self):
+        """Apply every pending input value, re-evaluating only where outputs change"""
+
+        self.flush_scheduled = False
+        if not self.pending:
+            return
+
+        graph = self.circuit.graph
+        changed = [id for id, value in self.pending.items() if graph.nodes[id]["output"] != value]
+        for id in changed:
+            graph.nodes[id]["output"] = self.pending[id]
+        self.pending.clear()
+
+        if changed:
+            self.circuit.settle_from(changed, self.rank)
+            self.stats["settles"] += 1
+
+
+    def read(self, names = None):
+        """Return the value of the named outputs (all by default)"""
+
+        self.flush()
+        if names is None:
+            names = self.outputs
+        graph = self.circuit.graph
+        values = {}
+        for name in names:
+            if name not in self.outputs:
+                raise ValueError("unknown output " + repr(name))
+            values[name] = graph.nodes[self.outputs[name]]["input"][0]
+        return values
+
+
+    def evaluate(self, vectors, names = None):
+        """
+        Evaluate many input vectors at once, bit-parallel, without changing the circuit state.
+        Inputs not in names keep their current value.
+        """
+
+        if names is None:
+            names = list(self.inputs)
+        for name in names:
+            if name not in self.inputs:
+                raise ValueError("unknown input " + repr(name))
+
+        if not vectors:
+            return []
+
+        masks = isinstance(vectors[0], int) and not isinstance(vectors[0], bool)
+        if masks:
+            for mask in vectors:
+                if not isinstance(mask, int) or isinstance(mask, bool) or mask < 0 or mask >> len(names):
+                    raise ValueError("vector masks must be ints of " + str(len(names)) + " bits")
+        else:
+            for vector in vectors:
+                if not isinstance(vector, list) or len(vector) != len(names) or not all(map(is_bit, vector)):
+                    raise ValueError("vectors must be lists of " + str(len(names)) + " bools")
+            vectors = [sum(1 << i for i, value in enumerate(vector) if value) for vector in vectors]
+
+        self.flush()
+        count = len(vectors)
+        all_vectors = (1 << count) - 1
+        graph = self.circuit.graph
+
+        words = {id: all_vectors if graph.nodes[id]["output"] else 0 for id in self.inputs.values()}
+        for name, word in zip(names, transpose(vectors, len(names))):
+            words[self.inputs[name]] = word
+
+        values = self.circuit.evaluate_words(words, all_vectors, self.order)
+        results = transpose([values[id] for id in self.outputs.values()], count)
+        self.stats["vectors"] += count
+
+        if masks:
+            return results
+        return [[bool(result >> j & 1) for j in range(len(self.outputs))] for result in results]
+
+
+
+class Server:
+    """A class to represent a server hosting named circuits."""
+
+    def __init__(self):
+        """Start with no circuits hosted."""
+
+        self.circuits = {} # key = name, value = Hosted
+
+
+    async def start(self, path = None, host = "127.0.0.1", port = 0):
+        """Listen on the Unix socket at path, or on host and port over TCP. Returns the asyncio server."""
+
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path = path, limit = MAX_FRAME)
+        return await asyncio.start_server(self.handle, host = host, port = port, limit = MAX_FRAME)
+
+
+    async def handle(self, reader, writer):
+        """Answer each request on a connection in order until the client disconnects"""
+
+        try:
+            first = await reader.read(1)
+            framed = first == b"\0"
+
+            while first or not reader.at_eof():
+                if framed:
+                    header = first + await reader.readexactly(4 - len(first))
+                    length = int.from_bytes(header, "big")
+                    if length >= MAX_FRAME:
+                        break
+                    message = await reader.readexactly(length)
+                else:
+                    try:
+                        message = first + await reader.readline()
+                    except ValueError:
+                        # A line longer than MAX_FRAME can't be read, so the connection is dropped
+                        break
+                first = b""
+
+                if not message.strip():
+                    continue
+
+                response = await self.respond(message)
+                data = json.dumps(response, separators = (",", ":")).encode()
+                if framed:
+                    writer.write(len(data).to_bytes(4, "big") + data)
+                else:
+                    writer.write(data + b"\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def respond(self, message):
+        """Decode and carry out one request, returning the response object"""
+
+        id = None
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            id = request.get("id")
+
+            if request.get("op") == "load":
+                response = await self.load(request)
+            else:
+                response = self.dispatch(request)
+            response["ok"] = True
+        except (ValueError, KeyError, TypeError, OSError, RecursionError) as error:
+            response = {"ok": False, "error": str(error)}
+
+        if id is not None:
+            response["id"] = id
+        return response
+
+
+    async def load(self, request):
+        """Load a netlist into a named circuit, parsing in a worker thread so other clients keep being served"""
+
+        name = field(request, "circuit", str)
+        format = field(request, "format", str, optional = True)
+        loop = asyncio.get_running_loop()
+
+        if "path" in request:
+            path = field(request, "path", str)
+            loaded = await loop.run_in_executor(None, netlist.load, path, format)
+        else:
+            text = field(request, "text", str)
+            if format is None:
+                format = "bench"
+            if format not in netlist.READERS:
+                raise ValueError("unknown netlist format " + repr(format))
+            start = time.perf_counter()
+            lines = text.splitlines()
+            loaded = await loop.run_in_executor(None, netlist.READERS[format], lines)
+            loaded.stats["seconds"] = time.perf_counter() - start
+
+        hosted = Hosted(loaded)
+        self.circuits[name] = hosted
+        return {"inputs": list(hosted.inputs), "outputs": list(hosted.outputs), "stats": loaded.stats}
+
+
+    def dispatch(self, request):
+        """Carry out any request other than load"""
+
+        op = request.get("op")
+        if op == "list":
+            return {"circuits": list(self.circuits)}
+
+        name = field(request, "circuit", str)
+        if name not in self.circuits:
+            raise ValueError("unknown circuit " + repr(name))
+        hosted = self.circuits[name]
+
+        if op == "set":
+            hosted.set(field(request, "values", dict))
+            # Sets that arrive before the event loop gets back to this circuit share one settle
+            if not hosted.flush_scheduled:
+                hosted.flush_scheduled = True
+                asyncio.get_running_loop().call_soon(hosted.flush)
+            return {}
+        elif op == "settle":
+            hosted.flush()
+            return {}
+        elif op == "read":
+            return {"outputs": hosted.read(field(request, "names", list, optional = True))}
+        elif op == "evaluate":
+            vectors = field(request, "vectors", list)
+            return {"outputs": hosted.evaluate(vectors, field(request, "inputs", list, optional = True))}
+        elif op == "unload":
+            del self.circuits[name]
+            return {}
+        elif op == "stats":
+            return {"stats": hosted.stats}
+
+        raise ValueError("unknown op " + repr(op))
+
+
+
+class Client:
+    """A class to represent a connection to a logix server, used by scripts and the benchmark."""
+
+    def __init__(self, reader, writer, framed = False):
+        """Wrap an open connection."""
+
+        self.reader = reader
+        self.writer = writer
+        self.framed = framed
+
+
+    @classmethod
+    async def connect(cls, path = None, host = "127.0.0.1", port = None, framed = False):
+        """Connect to the Unix socket at path, or to host and port over TCP"""
+
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit = MAX_FRAME)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit = MAX_FRAME)
+        return cls(reader, writer, framed)
+
+
+    def send(self, request):
+        """Queue one request without waiting for its response"""
+
+        data = json.dumps(request, separators = (",", ":")).encode()
+        if self.framed:
+            self.writer.write(len(data).to_bytes(4, "big") + data)
+        else:
+            self.writer.write(data + b"\n")
+
+
+    async def receive(self):
+        """Wait for the next response"""
+
+        if self.framed:
+            length = int.from_bytes(await self.reader.readexactly(4), "big")
+            return json.loads(await self.reader.readexactly(length))
+        return json.loads(await self.reader.readline())
+
+
+    async def pipeline(self, requests):
+        """Send every request, then collect the responses in order"""
+
+        for request in requests:
+            self.send(request)
+        await self.writer.drain()
+        return [await self.receive() for _ in requests]
+
+
+    async def request(self, **request):
+        """Send one request and wait for its response"""
+
+        return (await self.pipeline([request]))[0]
+
+
+    async def close(self):
+        """Close the connection"""
+
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+
+def adder_bench(bits):
+    """Return the .bench netlist of a ripple carry adder, used when benchmarking without a netlist"""
+
+    lines = ["INPUT(CIN)"]
+    lines += ["INPUT(A" + str(i) + ")" for i in range(bits)]
+    lines += ["INPUT(B" + str(i) + ")" for i in range(bits)]
+
+    carry = "CIN"
+    for i in range(bits):
+        a, b, n = "A" + str(i), "B" + str(i), str(i)
+        lines.append("P" + n + " = XOR(" + a + ", " + b + ")")
+        lines.append("S" + n + " = XOR(P" + n + ", " + carry + ")")
+        lines.append("G" + n + " = AND(" + a + ", " + b + ")")
+        lines.append("T" + n + " = AND(P" + n + ", " + carry + ")")
+        lines.append("C" + n + " = OR(G" + n + ", T" + n + ")")
+        lines.append("OUTPUT(S" + n + ")")
+        carry = "C" + n
+    lines.append("OUTPUT(" + carry + ")")
+
+    return "\n".join(lines)
+
+
+async def benchmark(path = None, requests = 20000, vectors = 4096, framed = False):
+    """Measure request and vector throughput of a server against a local client over TCP"""
+
+    server = Server()
+    listener = await server.start()
+    port = listener.sockets[0].getsockname()[1]
+    client = await Client.connect(port = port, framed = framed)
+
+    if path is None:
+        loaded = await client.request(op = "load", circuit = "bench", text = adder_bench(32))
+    else:
+        loaded = await client.request(op = "load", circuit = "bench", path = path)
+    if not loaded["ok"]:
+        raise ValueError(loaded["error"])
+    inputs = loaded["inputs"]
+    print("loaded {nodes} nodes in {seconds:.3f} s".format(**loaded["stats"]))
+
+    # Pipelined sets with a read after every fourth, the sets in between share one settle
+    batch = []
+    for i in range(requests):
+        batch.append({"op": "set", "circuit": "bench", "values": {inputs[i % len(inputs)]: i % 3 == 0}})
+        if i % 4 == 3:
+            batch.append({"op": "read", "circuit": "bench"})
+    start = time.perf_counter()
+    await client.pipeline(batch)
+    seconds = time.perf_counter() - start
+    print("set/read: {} requests in {:.3f} s, {:.0f} requests/s".format(len(batch), seconds, len(batch) / seconds))
+
+    # Batch evaluation of random vectors given as int masks
+    masks = [hash((i, "vector")) & ((1 << len(inputs)) - 1) for i in range(vectors)]
+    start = time.perf_counter()
+    await client.request(op = "evaluate", circuit = "bench", vectors = masks)
+    seconds = time.perf_counter() - start
+    print("evaluate: {} vectors in {:.3f} s, {:.0f} vectors/s".format(vectors, seconds, vectors / seconds))
+
+    stats = (await client.request(op = "stats", circuit = "bench"))["stats"]
+    print("{sets} sets coalesced into {settles} settles".format(**stats))
+
+    await client.close()
+    listener.close()
+    await listener.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Host logix circuits for other processes.")
+    parser.add_argument("--unix", metavar = "PATH", help = "listen on a Unix socket instead of TCP")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 7420)
+    parser.add_argument("--bench", nargs = "?", const = "", metavar = "NETLIST",
+                        help = "measure throughput against a local client (on a 32 bit adder by default)")
+    parser.add_argument("--framed", action = "store_true", help = "use length-prefixed messages in the benchmark")
+    parser.add_argument("--requests", type = int, default = 20000, help = "number of sets in the benchmark")
+    parser.add_argument("--vectors", type = int, default = 4096, help = "number of vectors evaluated in the benchmark")
+    args = parser.parse_args()
+
+    if args.bench is not None:
+        asyncio.run(benchmark(args.bench or None, args.requests, args.vectors, args.framed))
+        return
+
+    async def serve():
+        listener = await Server().start(args.unix, args.host, args.port)
+        print("logix server listening on " + (args.unix or args.host + ":" + str(args.port)))
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        sys.exit()
+
+if __name__ == '__main__':
+    main()